@@ -3,20 +3,27 @@ Jira Review Tracker Dashboard
 Tracks review bounce-backs, time in states, and logged hours for Jira tickets.
 """
 
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import chain
+
 import streamlit as st
 import pandas as pd
 
 from jira_client import (
-    get_issue,
-    get_changelog,
-    get_worklogs,
+    JiraAPIError,
+    JiraClient,
+    batch_fetch,
+    embedded_changelog,
     extract_status_transitions,
     extract_description_text,
-    extract_comments_text,
+    iter_comments_text,
     JIRA_URL,
     JIRA_EMAIL,
     JIRA_API_TOKEN,
 )
+from models import Ticket
 from utils import (
     parse_issue_keys_from_csv,
     parse_issue_keys_from_text,
@@ -55,6 +62,11 @@ with st.sidebar:
     else:
         st.success(f"Connected to **{JIRA_URL}**")
 
+    if st.button("Force Refresh", help="Clear cached Jira responses and fetch fresh data."):
+        # Resources hold the per-key search cache (and the client), so clear them too
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
     st.divider()
     st.subheader("Workflow Reference")
     st.code("To Do → In Progress → In Review → Done", language=None)
@@ -78,7 +90,9 @@ with column_csv:
         help="The CSV file should contain a column named 'Key' or 'Issue key'.",
     )
     if uploaded_file is not None:
-        csv_keys = parse_issue_keys_from_csv(uploaded_file.getvalue())
+        # Parse the upload in place rather than copying its buffer; reruns reuse the same object
+        uploaded_file.seek(0)
+        csv_keys = parse_issue_keys_from_csv(uploaded_file)
         if csv_keys:
             st.success(f"Found **{len(csv_keys)}** ticket(s) in the CSV file")
             issue_keys.extend(csv_keys)
@@ -111,50 +125,273 @@ st.divider()
 
 st.header("Ticket Analysis")
 
+
+@st.cache_resource
+def get_client() -> JiraClient:
+    """One long-lived Jira client (session, connection pool, ETag cache) per server process."""
+    return JiraClient(JIRA_URL, JIRA_EMAIL, JIRA_API_TOKEN)
+
+
+_CACHE_TTL_SECONDS = 600
+
+
+@st.cache_resource
+def _issue_cache() -> tuple[threading.Lock, dict[str, tuple[float, dict, list[dict] | None]]]:
+    """
+    Search results per issue key, as (fetched at, issue, embedded changelog), shared by
+    every session thread, with the lock that guards them.
+    """
+    return threading.Lock(), {}
+
+
+def _search_tickets(keys: list[str]) -> dict[str, tuple[dict, list[dict] | None]]:
+    """
+    Fetch core fields and embedded changelogs in bulk, searching only keys not cached recently.
+    Cached per key, so adding one key to the list searches just that key.
+    Returns issue key -> (issue, embedded changelog or None if truncated).
+    """
+    lock, cache = _issue_cache()
+    now = time.monotonic()
+
+    # Sweep and read under the lock; this run keeps its own copy of the hits, so another
+    # session evicting entries afterwards cannot take them away mid-run
+    with lock:
+        for key, (fetched_at, _, _) in list(cache.items()):
+            if now - fetched_at >= _CACHE_TTL_SECONDS:
+                del cache[key]
+        results = {key: cache[key][1:] for key in keys if key in cache}
+
+    missing = [key for key in keys if key not in results]
+    if missing:
+        # Search outside the lock so other sessions are not held up by the network
+        for key, issue in get_client().search_issues(missing).items():
+            results[key] = (issue, embedded_changelog(issue))
+        with lock:
+            for key in missing:
+                if key in results:
+                    cache[key] = (now, *results[key])
+
+    return results
+
+
+# Failed requests raise JiraAPIError out of these cached functions — st.cache_data never
+# caches exceptions, so the next click retries instead of replaying an empty result.
+@st.cache_data(ttl=_CACHE_TTL_SECONDS, show_spinner=False)
+def _fetch_changelog(key: str) -> list[dict]:
+    return get_client().get_changelog(key)
+
+
+@st.cache_data(ttl=_CACHE_TTL_SECONDS, show_spinner=False)
+def _fetch_worklogs(key: str) -> list[dict]:
+    return get_client().get_worklogs(key)
+
+
+def _fetch_details(
+    key: str, changelog: list[dict] | None
+) -> tuple[list[dict], list[dict]] | None:
+    """
+    Fetch worklogs, plus the full changelog when the search result only had a truncated one.
+    Returns None if a request failed, so the ticket is skipped rather than shown with no data.
+    """
+    try:
+        if changelog is None:
+            changelog = _fetch_changelog(key)
+        return changelog, _fetch_worklogs(key)
+    except JiraAPIError:
+        return None
+
+
+def _format_timestamps(timestamps: pd.Series) -> pd.Series:
+    """
+    Format ISO timestamps as 'YYYY-MM-DD HH:MM:SS' for display, in one vectorized pass.
+    Keeps each timestamp's own wall-clock time; blank or malformed values become empty.
+    """
+    parsed = pd.to_datetime(
+        timestamps.astype(str).str[:19],
+        format="%Y-%m-%dT%H:%M:%S",
+        errors="coerce",
+    )
+    return parsed.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+
+
+def _build_ticket_details(ticket: Ticket) -> dict[str, pd.DataFrame]:
+    """Build the transition, time-in-state, and bounce-back tables shown for one ticket."""
+    transitions_df = pd.DataFrame(ticket.transitions, copy=False)
+    transitions_df["timestamp"] = _format_timestamps(transitions_df["timestamp"])
+    transitions_df = transitions_df.rename(columns={
+        "timestamp": "Timestamp",
+        "from_status": "From Status",
+        "to_status": "To Status",
+        "author": "Changed By",
+    })
+
+    states_df = pd.DataFrame(ticket.time_in_states, copy=False)
+    states_df["entered"] = _format_timestamps(states_df["entered"])
+    states_df["exited"] = _format_timestamps(states_df["exited"])
+    states_df = states_df[["status", "entered", "exited", "duration_hours"]].rename(columns={
+        "status": "Status",
+        "entered": "Entered",
+        "exited": "Exited",
+        "duration_hours": "Duration (Hours)",
+    })
+
+    bounce_backs_df = pd.DataFrame(ticket.bounce_backs, copy=False)
+    bounce_backs_df["is_blocked"] = bounce_backs_df["is_blocked"].map(
+        {True: "Blocked", False: "Bounce-Back"}
+    )
+    bounce_backs_df["timestamp"] = _format_timestamps(bounce_backs_df["timestamp"])
+    bounce_backs_df = bounce_backs_df[
+        ["is_blocked", "timestamp", "from_status", "to_status", "author"]
+    ].rename(columns={
+        "is_blocked": "Event Type",
+        "timestamp": "Timestamp",
+        "from_status": "From Status",
+        "to_status": "To Status",
+        "author": "Changed By",
+    })
+
+    return {
+        "transitions_df": transitions_df,
+        "states_df": states_df,
+        "bounce_backs_df": bounce_backs_df,
+    }
+
+
+def _build_ticket_view(tickets: list[Ticket]) -> dict:
+    """
+    Precompute everything the results section renders, so widget reruns only draw.
+    Returns the tickets with the overview metrics, the summary table, and per-ticket tables.
+    """
+    # One long table of every period, pivoted once into hours per (ticket, state)
+    period_df = pd.DataFrame({
+        "key": [ticket.key for ticket in tickets for _ in ticket.time_in_states["status_norm"]],
+        "status": [
+            status for ticket in tickets for status in ticket.time_in_states["status_norm"]
+        ],
+        "hours": [
+            hours for ticket in tickets for hours in ticket.time_in_states["duration_hours"]
+        ],
+    })
+    state_hours = (
+        period_df.groupby(["key", "status"])["hours"]
+        .sum()
+        .unstack(fill_value=0.0)
+        .reindex(
+            index=[ticket.key for ticket in tickets],
+            columns=["in review", "in progress"],
+            fill_value=0.0,
+        )
+    )
+
+    total_bounce_backs = sum(ticket.bounce_back_count for ticket in tickets)
+    average_bounce_backs = total_bounce_backs / len(tickets) if tickets else 0
+    total_hours_logged = sum(ticket.hours_logged for ticket in tickets)
+    average_review_hours = state_hours["in review"].sum() / len(tickets) if tickets else 0
+
+    summary_df = pd.DataFrame({
+        "Issue Key": [ticket.key for ticket in tickets],
+        "Title": [ticket.summary for ticket in tickets],
+        "Assignee": [ticket.assignee for ticket in tickets],
+        "Current Status": [ticket.status for ticket in tickets],
+        "Bounce-Backs": [ticket.bounce_back_count for ticket in tickets],
+        "Hours Logged": [ticket.hours_logged for ticket in tickets],
+    })
+    summary_df["Hours in Review"] = state_hours["in review"].round(1).to_numpy()
+    summary_df["Hours in Progress"] = state_hours["in progress"].round(1).to_numpy()
+    summary_df["Testim References"] = [len(ticket.testim_references) for ticket in tickets]
+    summary_df = summary_df[[
+        "Issue Key",
+        "Title",
+        "Assignee",
+        "Current Status",
+        "Bounce-Backs",
+        "Hours in Review",
+        "Hours in Progress",
+        "Hours Logged",
+        "Testim References",
+    ]]
+
+    return {
+        "tickets": tickets,
+        "summary_df": summary_df,
+        "details": {ticket.key: _build_ticket_details(ticket) for ticket in tickets},
+        "metrics": {
+            "total_bounce_backs": total_bounce_backs,
+            "average_bounce_backs": average_bounce_backs,
+            "total_hours_logged": total_hours_logged,
+            "average_review_hours": average_review_hours,
+        },
+    }
+
+
 if st.button("Fetch and Analyze Tickets", type="primary", use_container_width=True):
+    st.session_state.pop("ticket_view", None)
     all_ticket_data = []
     progress_bar = st.progress(0, text="Fetching tickets...")
 
-    for index, key in enumerate(issue_keys):
+    try:
+        search_results = _search_tickets(issue_keys)
+    except JiraAPIError as error:
+        progress_bar.empty()
+        st.error(f"Jira search failed ({error}). Please try again.")
+        st.stop()
+    found_keys = [key for key in issue_keys if key in search_results]
+
+    # Worklogs live on a separate endpoint — fetch them concurrently, then analyze in input order
+    fetched_details = {}
+    for done_count, (key, result) in enumerate(
+        batch_fetch(found_keys, lambda key: _fetch_details(key, search_results[key][1])),
+        start=1,
+    ):
+        fetched_details[key] = result
         progress_bar.progress(
-            (index + 1) / len(issue_keys),
-            text=f"Fetching {key} ({index + 1} of {len(issue_keys)})...",
+            done_count / len(found_keys),
+            text=f"Fetched {key} ({done_count} of {len(found_keys)})...",
         )
 
-        issue = get_issue(key)
-        if issue is None:
+    # One "now" for the whole batch, so every open-ended period ends at the same instant
+    analyzed_at = datetime.now(timezone.utc)
+    for key in issue_keys:
+        if key not in search_results:
             st.warning(f"Could not fetch **{key}** — skipping")
             continue
 
+        if fetched_details[key] is None:
+            st.warning(f"Could not fetch changelog or worklogs for **{key}** — skipping")
+            continue
+
+        issue = search_results[key][0]
+        changelog, worklogs = fetched_details[key]
         fields = issue.get("fields", {})
-        changelog = get_changelog(key)
-        worklogs = get_worklogs(key)
 
         transitions = extract_status_transitions(changelog)
         bounce_backs = detect_bounce_backs(transitions)
-        time_in_states = compute_time_in_states(transitions, created_date=fields.get("created"))
+        time_in_states = compute_time_in_states(
+            transitions, created_date=fields.get("created"), now=analyzed_at
+        )
         hours_logged = total_worklog_hours(worklogs)
 
         description_text = extract_description_text(fields.get("description"))
-        comments = extract_comments_text(issue)
-        testim_refs = find_testim_references(description_text, comments)
+        testim_refs = find_testim_references(
+            chain((description_text,), iter_comments_text(issue))
+        )
 
         assignee = (fields.get("assignee") or {}).get("displayName", "Unassigned")
         current_status = (fields.get("status") or {}).get("name", "Unknown")
 
-        all_ticket_data.append({
-            "key": key,
-            "summary": fields.get("summary", ""),
-            "assignee": assignee,
-            "status": current_status,
-            "transitions": transitions,
-            "bounce_backs": bounce_backs,
-            "bounce_back_count": len(bounce_backs),
-            "time_in_states": time_in_states,
-            "hours_logged": hours_logged,
-            "description": description_text,
-            "testim_references": testim_refs,
-        })
+        all_ticket_data.append(Ticket(
+            key=key,
+            summary=fields.get("summary", ""),
+            assignee=assignee,
+            status=current_status,
+            transitions=transitions,
+            bounce_backs=bounce_backs,
+            bounce_back_count=len(bounce_backs["timestamp"]),
+            time_in_states=time_in_states,
+            hours_logged=hours_logged,
+            description=description_text,
+            testim_references=testim_refs,
+        ))
 
     progress_bar.empty()
 
@@ -162,71 +399,33 @@ if st.button("Fetch and Analyze Tickets", type="primary", use_container_width=Tr
         st.error("No tickets could be fetched. Please verify your credentials and issue keys.")
         st.stop()
 
-    st.session_state["ticket_data"] = all_ticket_data
+    st.session_state["ticket_view"] = _build_ticket_view(all_ticket_data)
 
 # ─── Display Results ───
 
-if "ticket_data" not in st.session_state:
+if "ticket_view" not in st.session_state:
     st.stop()
 
-data = st.session_state["ticket_data"]
+ticket_view = st.session_state["ticket_view"]
+data = ticket_view["tickets"]
+metrics = ticket_view["metrics"]
+summary_df = ticket_view["summary_df"]
+details = ticket_view["details"]
 
 # ─── Aggregate Metrics ───
 
 st.subheader("Overview")
 
-total_bounce_backs = sum(ticket["bounce_back_count"] for ticket in data)
-average_bounce_backs = total_bounce_backs / len(data) if data else 0
-total_hours_logged = sum(ticket["hours_logged"] for ticket in data)
-average_review_hours = (
-    sum(
-        sum(
-            period["duration_hours"]
-            for period in ticket["time_in_states"]
-            if period["status"].strip().lower() == "in review"
-        )
-        for ticket in data
-    )
-    / len(data)
-    if data
-    else 0
-)
-
 metric_col_1, metric_col_2, metric_col_3, metric_col_4 = st.columns(4)
-metric_col_1.metric("Total Bounce-Backs", total_bounce_backs)
-metric_col_2.metric("Average Bounce-Backs per Ticket", f"{average_bounce_backs:.1f}")
-metric_col_3.metric("Total Hours Logged", f"{total_hours_logged:.1f} h")
-metric_col_4.metric("Average Hours in Review", f"{average_review_hours:.1f} h")
+metric_col_1.metric("Total Bounce-Backs", metrics["total_bounce_backs"])
+metric_col_2.metric("Average Bounce-Backs per Ticket", f"{metrics['average_bounce_backs']:.1f}")
+metric_col_3.metric("Total Hours Logged", f"{metrics['total_hours_logged']:.1f} h")
+metric_col_4.metric("Average Hours in Review", f"{metrics['average_review_hours']:.1f} h")
 
 # ─── Summary Table ───
 
 st.subheader("Summary Table")
 
-summary_rows = []
-for ticket in data:
-    review_hours = sum(
-        period["duration_hours"]
-        for period in ticket["time_in_states"]
-        if period["status"].strip().lower() == "in review"
-    )
-    progress_hours = sum(
-        period["duration_hours"]
-        for period in ticket["time_in_states"]
-        if period["status"].strip().lower() == "in progress"
-    )
-    summary_rows.append({
-        "Issue Key": ticket["key"],
-        "Title": ticket["summary"],
-        "Assignee": ticket["assignee"],
-        "Current Status": ticket["status"],
-        "Bounce-Backs": ticket["bounce_back_count"],
-        "Hours in Review": round(review_hours, 1),
-        "Hours in Progress": round(progress_hours, 1),
-        "Hours Logged": ticket["hours_logged"],
-        "Testim References": len(ticket["testim_references"]),
-    })
-
-summary_df = pd.DataFrame(summary_rows)
 st.dataframe(
     summary_df,
     use_container_width=True,
@@ -248,80 +447,54 @@ st.divider()
 st.subheader("Ticket Details")
 
 for ticket in data:
-    with st.expander(f"**{ticket['key']}** — {ticket['summary']}", expanded=False):
+    with st.expander(f"**{ticket.key}** — {ticket.summary}", expanded=False):
 
         # ── Info & Stats ──
         info_column, stats_column = st.columns([2, 1])
 
         with info_column:
-            st.markdown(f"**Assignee:** {ticket['assignee']}")
-            st.markdown(f"**Current Status:** `{ticket['status']}`")
+            st.markdown(f"**Assignee:** {ticket.assignee}")
+            st.markdown(f"**Current Status:** `{ticket.status}`")
 
-            if ticket["testim_references"]:
+            if ticket.testim_references:
                 st.markdown("**Testim References:**")
-                for reference in ticket["testim_references"]:
+                for reference in ticket.testim_references:
                     st.markdown(f"- `{reference}`")
 
         with stats_column:
-            st.metric("Bounce-Backs", ticket["bounce_back_count"])
-            st.metric("Hours Logged", f"{ticket['hours_logged']} h")
+            st.metric("Bounce-Backs", ticket.bounce_back_count)
+            st.metric("Hours Logged", f"{ticket.hours_logged} h")
+
+        ticket_details = details[ticket.key]
 
         # ── Status Transitions Timeline ──
-        if ticket["transitions"]:
+        if not ticket_details["transitions_df"].empty:
             st.markdown("**Status Transition History**")
-            transition_rows = []
-            for transition in ticket["transitions"]:
-                transition_rows.append({
-                    "Timestamp": transition["timestamp"][:19].replace("T", " "),
-                    "From Status": transition["from_status"],
-                    "To Status": transition["to_status"],
-                    "Changed By": transition["author"],
-                })
             st.dataframe(
-                pd.DataFrame(transition_rows),
+                ticket_details["transitions_df"],
                 use_container_width=True,
                 hide_index=True,
             )
 
         # ── Time Spent in Each State ──
-        if ticket["time_in_states"]:
+        if not ticket_details["states_df"].empty:
             st.markdown("**Time Spent in Each State**")
-            state_period_rows = []
-            for period in ticket["time_in_states"]:
-                entered = period["entered"][:19].replace("T", " ") if period["entered"] else ""
-                exited = period["exited"][:19].replace("T", " ") if period["exited"] else ""
-                state_period_rows.append({
-                    "Status": period["status"],
-                    "Entered": entered,
-                    "Exited": exited,
-                    "Duration (Hours)": period["duration_hours"],
-                })
             st.dataframe(
-                pd.DataFrame(state_period_rows),
+                ticket_details["states_df"],
                 use_container_width=True,
                 hide_index=True,
             )
 
         # ── Bounce-Back Events ──
-        if ticket["bounce_backs"]:
+        if ticket.bounce_back_count:
             st.markdown("**Bounce-Back Events**")
-            bounce_back_rows = []
-            for event in ticket["bounce_backs"]:
-                event_type = "Blocked" if event.get("is_blocked") else "Bounce-Back"
-                bounce_back_rows.append({
-                    "Event Type": event_type,
-                    "Timestamp": event["timestamp"][:19].replace("T", " "),
-                    "From Status": event["from_status"],
-                    "To Status": event["to_status"],
-                    "Changed By": event["author"],
-                })
             st.dataframe(
-                pd.DataFrame(bounce_back_rows),
+                ticket_details["bounce_backs_df"],
                 use_container_width=True,
                 hide_index=True,
             )
 
         # ── Description ──
-        if ticket["description"]:
+        if ticket.description:
             with st.popover("View Full Description"):
-                st.markdown(ticket["description"][:3000])
+                st.markdown(ticket.description[:3000])
@@ -3,12 +3,27 @@ Jira Cloud REST API client.
 Handles authentication and fetches issue details, changelogs, and worklogs.
 """
 
+import json
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+from models import Columns
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional — stdlib json is slower but equivalent
+    _json_loads = json.loads
+
 load_dotenv()
 
 
@@ -27,60 +42,263 @@ JIRA_URL = _get_secret("JIRA_URL").rstrip("/")
 JIRA_EMAIL = _get_secret("JIRA_EMAIL")
 JIRA_API_TOKEN = _get_secret("JIRA_API_TOKEN")
 
-_AUTH = HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
 _HEADERS = {"Accept": "application/json"}
 _TIMEOUT = 30
+_MAX_WORKERS = 8
 
+# Only the issue fields the dashboard reads
+_ISSUE_FIELDS = ["summary", "status", "assignee", "description", "comment", "created"]
+_SEARCH_BATCH_SIZE = 100
+_CHANGELOG_PAGE_SIZE = 100
+_CHANGELOG_WORKERS = 4
+# get_changelog runs its page pool inside each batch_fetch worker, so size for the product
+_POOL_SIZE = _MAX_WORKERS * _CHANGELOG_WORKERS
+# Most recent GET bodies kept for ETag revalidation; the client lives as long as the server
+_ETAG_CACHE_SIZE = 256
 
-def get_issue(issue_key: str) -> dict | None:
-    """Fetch core issue fields: summary, status, assignee, description, comments."""
-    url = f"{JIRA_URL}/rest/api/3/issue/{issue_key}"
-    params = {"fields": "summary,status,assignee,description,comment"}
-    response = requests.get(url, headers=_HEADERS, auth=_AUTH, params=params, timeout=_TIMEOUT)
-    if response.status_code == 200:
-        return response.json()
-    return None
 
+class JiraAPIError(Exception):
+    """A Jira request failed (network error or non-200 response after retries)."""
 
-def get_changelog(issue_key: str) -> list[dict]:
-    """Fetch the full changelog for an issue, handling pagination."""
-    all_histories = []
-    start_at = 0
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
 
-    while True:
-        url = f"{JIRA_URL}/rest/api/3/issue/{issue_key}/changelog"
-        params = {"startAt": start_at, "maxResults": 100}
-        response = requests.get(url, headers=_HEADERS, auth=_AUTH, params=params, timeout=_TIMEOUT)
 
-        if response.status_code != 200:
-            break
+def _slim_history(history: dict) -> dict:
+    """Keep only the changelog data used for status analysis: timestamp, author name, status items."""
+    author = history.get("author")
+    return {
+        "created": history.get("created", ""),
+        "author": {"displayName": author.get("displayName", "Unknown")} if author else None,
+        "items": [item for item in history.get("items", []) if item.get("field") == "status"],
+    }
 
-        data = response.json()
-        values = data.get("values", [])
-        all_histories.extend(values)
 
-        if start_at + len(values) >= data.get("total", 0):
-            break
-        start_at += len(values)
+def embedded_changelog(issue_data: dict) -> list[dict] | None:
+    """
+    Pop the changelog embedded by ``expand=changelog`` off an issue payload.
+    Returns None when Jira truncated it, so the caller must page the changelog endpoint.
+    """
+    changelog = issue_data.pop("changelog", None) or {}
+    histories = changelog.get("histories", [])
+    if changelog.get("total", 0) > len(histories):
+        return None
+    return [_slim_history(history) for history in histories]
 
-    return all_histories
 
+class JiraClient:
+    """
+    Client for one Jira site. Holds a single authenticated session whose
+    connection pool is shared by every call and thread for the client's lifetime.
+    """
 
-def get_worklogs(issue_key: str) -> list[dict]:
-    """Fetch all worklogs (time entries) for an issue."""
-    url = f"{JIRA_URL}/rest/api/3/issue/{issue_key}/worklog"
-    response = requests.get(url, headers=_HEADERS, auth=_AUTH, timeout=_TIMEOUT)
-    if response.status_code == 200:
-        return response.json().get("worklogs", [])
-    return []
+    def __init__(self, url: str, email: str, token: str):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(email, token)
+        self.session.headers.update(_HEADERS)
+        self.session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=_POOL_SIZE,
+                pool_maxsize=_POOL_SIZE,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    # Issue search is a read-only POST, so it is as safe to retry as a GET
+                    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+                    raise_on_status=False,
+                ),
+            ),
+        )
+        # Last ETag and raw body per GET URL, for conditional requests; bounded LRU shared by threads
+        self._etag_cache: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._etag_lock = threading.Lock()
+
+    def _get_json(self, path: str, params: dict | None = None):
+        """
+        GET a Jira API path and decode its JSON body; raises JiraAPIError on failure.
+        Repeat requests send If-None-Match, so unchanged resources come back as an empty 304.
+        """
+        url = f"{self.url}{path}"
+        cache_key = f"{url}?{urlencode(params)}" if params else url
+        with self._etag_lock:
+            cached = self._etag_cache.get(cache_key)
+            if cached:
+                self._etag_cache.move_to_end(cache_key)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=_TIMEOUT)
+        except requests.RequestException as error:
+            raise JiraAPIError(f"GET {path} failed: {error}") from error
+
+        # The raw body is cached and decoded per call, so callers never share mutable results
+        if response.status_code == 304 and cached:
+            return _json_loads(cached[1])
+        if response.status_code != 200:
+            raise JiraAPIError(
+                f"GET {path} returned HTTP {response.status_code}", response.status_code
+            )
+
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._etag_lock:
+                self._etag_cache[cache_key] = (etag, response.content)
+                self._etag_cache.move_to_end(cache_key)
+                if len(self._etag_cache) > _ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return _json_loads(response.content)
+
+    def get_issue(self, issue_key: str) -> dict | None:
+        """
+        Fetch one issue's core fields with its changelog embedded, shaped like a search result.
+        Jira resolves moved keys and any letter case here. Returns None if the issue does not exist.
+        """
+        params = {"fields": ",".join(_ISSUE_FIELDS), "expand": "changelog"}
+        try:
+            return self._get_json(f"/rest/api/3/issue/{issue_key}", params)
+        except JiraAPIError as error:
+            if error.status_code == 404:
+                return None
+            raise
+
+    def _get_changelog_page(self, issue_key: str, start_at: int) -> dict:
+        """Fetch one page of an issue's changelog."""
+        params = {"startAt": start_at, "maxResults": _CHANGELOG_PAGE_SIZE}
+        return self._get_json(f"/rest/api/3/issue/{issue_key}/changelog", params)
+
+    def get_changelog(self, issue_key: str) -> list[dict]:
+        """
+        Fetch the full changelog for an issue, handling pagination.
+        Once the first page reveals the total, the remaining pages are fetched concurrently.
+        """
+        first_page = self._get_changelog_page(issue_key, 0)
+        first_values = first_page.get("values", [])
+        all_histories = [_slim_history(history) for history in first_values]
+
+        page_size = len(first_values)
+        if not page_size:
+            return all_histories
+
+        offsets = range(page_size, first_page.get("total", 0), page_size)
+        with ThreadPoolExecutor(max_workers=_CHANGELOG_WORKERS) as executor:
+            pages = executor.map(
+                lambda start_at: self._get_changelog_page(issue_key, start_at), offsets
+            )
+
+            # Pages come back in offset order; a failed page raises here instead of truncating
+            for page in pages:
+                all_histories.extend(_slim_history(history) for history in page.get("values", []))
+
+        return all_histories
+
+    def _search_page(self, issue_keys: list[str], next_page_token: str | None) -> dict | None:
+        """
+        POST one page of a ``key in (...)`` JQL search.
+        Returns None when Jira rejects the query (HTTP 400), which for a key list usually
+        means one of the keys does not exist; any other failure raises JiraAPIError.
+        """
+        payload = {
+            "jql": f"key in ({', '.join(json.dumps(key) for key in issue_keys)})",
+            "fields": _ISSUE_FIELDS,
+            "expand": "changelog",
+            "maxResults": len(issue_keys),
+        }
+        if next_page_token:
+            payload["nextPageToken"] = next_page_token
+
+        try:
+            response = self.session.post(
+                f"{self.url}/rest/api/3/search/jql", json=payload, timeout=_TIMEOUT
+            )
+        except requests.RequestException as error:
+            raise JiraAPIError(f"Issue search failed: {error}") from error
+        if response.status_code == 400:
+            return None
+        if response.status_code != 200:
+            raise JiraAPIError(
+                f"Issue search returned HTTP {response.status_code}", response.status_code
+            )
+        return _json_loads(response.content)
+
+    def search_issues(
+        self,
+        issue_keys: list[str],
+        batch_size: int = _SEARCH_BATCH_SIZE,
+    ) -> dict[str, dict]:
+        """
+        Fetch core issue fields and embedded changelogs for many issues via JQL search.
+        Returns a mapping of requested issue key to issue data; keys Jira cannot find are omitted.
+        Raises JiraAPIError if a search request fails, rather than returning a partial mapping.
+
+        Search results carry each issue's current key, so a moved issue (OLD-1 now NEW-5) or a
+        key typed in another letter case comes back under a different key. Requested keys missing
+        from the results are fetched one by one, which resolves both, and stored as requested.
+        """
+        issues = {}
+        batches = [
+            issue_keys[batch_start:batch_start + batch_size]
+            for batch_start in range(0, len(issue_keys), batch_size)
+        ]
+
+        while batches:
+            batch = batches.pop()
+            next_page_token = None
+
+            while True:
+                data = self._search_page(batch, next_page_token)
+                if data is None:
+                    # Rejected query: split the batch to isolate the unknown keys.
+                    # A single rejected key is reported as not found.
+                    if len(batch) > 1:
+                        middle = len(batch) // 2
+                        batches += [batch[middle:], batch[:middle]]
+                    break
+
+                for issue in data.get("issues", []):
+                    issues[issue["key"]] = issue
+
+                next_page_token = data.get("nextPageToken")
+                if data.get("isLast", True) or not next_page_token:
+                    break
+
+        missing = [key for key in issue_keys if key not in issues]
+        for key, issue in batch_fetch(missing, self.get_issue):
+            if issue is not None:
+                issues[key] = issue
+
+        return {key: issues[key] for key in issue_keys if key in issues}
+
+    def get_worklogs(self, issue_key: str) -> list[dict]:
+        """Fetch all worklogs (time entries) for an issue, keeping only the time spent."""
+        data = self._get_json(f"/rest/api/3/issue/{issue_key}/worklog")
+        return [
+            {"timeSpentSeconds": entry.get("timeSpentSeconds", 0)}
+            for entry in data.get("worklogs", [])
+        ]
+
+
+def batch_fetch(keys: list[str], fn, max_workers: int = _MAX_WORKERS):
+    """
+    Call ``fn(key)`` for every key concurrently on a thread pool.
+    Yields ``(key, result)`` pairs in completion order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fn, key): key for key in keys}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
 
-def extract_status_transitions(changelog: list[dict]) -> list[dict]:
+def extract_status_transitions(changelog: list[dict]) -> Columns:
     """
     Extract status transitions from changelog entries.
-    Returns a chronologically sorted list of transitions.
+    Returns chronologically sorted transitions as columns:
+    timestamp, from_status, to_status, author.
     """
-    transitions = []
+    timestamps, from_statuses, to_statuses, authors = [], [], [], []
 
     for history in changelog:
         timestamp = history.get("created", "")
@@ -88,19 +306,22 @@ def extract_status_transitions(changelog: list[dict]) -> list[dict]:
 
         for item in history.get("items", []):
             if item.get("field") == "status":
-                transitions.append({
-                    "timestamp": timestamp,
-                    "from_status": item.get("fromString", ""),
-                    "to_status": item.get("toString", ""),
-                    "author": author,
-                })
+                timestamps.append(timestamp)
+                from_statuses.append(item.get("fromString", ""))
+                to_statuses.append(item.get("toString", ""))
+                authors.append(author)
 
-    transitions.sort(key=lambda t: t["timestamp"])
-    return transitions
+    order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+    return {
+        "timestamp": [timestamps[index] for index in order],
+        "from_status": [from_statuses[index] for index in order],
+        "to_status": [to_statuses[index] for index in order],
+        "author": [authors[index] for index in order],
+    }
 
 
 def _extract_adf_text(node) -> str:
-    """Recursively extract plain text from Jira's Atlassian Document Format."""
+    """Extract plain text from Jira's Atlassian Document Format."""
     if node is None:
         return ""
     if isinstance(node, str):
@@ -108,17 +329,20 @@ def _extract_adf_text(node) -> str:
 
     text_parts = []
 
-    def walk(current):
-        if isinstance(current, dict):
+    # Iterative depth-first walk; children are pushed reversed to keep document order.
+    # ADF comes straight from JSON decoding, so exact dict/list type checks are safe.
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if type(current) is dict:
             if current.get("type") == "text":
                 text_parts.append(current.get("text", ""))
-            for child in current.get("content", []):
-                walk(child)
-        elif isinstance(current, list):
-            for item in current:
-                walk(item)
+            children = current.get("content")
+            if children:
+                stack.extend(reversed(children))
+        elif type(current) is list:
+            stack.extend(reversed(current))
 
-    walk(node)
     return " ".join(text_parts)
 
 
@@ -126,14 +350,16 @@ def _extract_adf_text(node) -> str:
 extract_description_text = _extract_adf_text
 
 
-def extract_comments_text(issue_data: dict) -> list[str]:
-    """Extract plain text from all comments on an issue."""
-    comments = []
+def iter_comments_text(issue_data: dict):
+    """Yield the plain text of each non-empty comment on an issue."""
     comment_field = (issue_data.get("fields") or {}).get("comment", {})
 
     for comment in comment_field.get("comments", []):
         text = _extract_adf_text(comment.get("body"))
         if text:
-            comments.append(text)
+            yield text
+
 
-    return comments
+def extract_comments_text(issue_data: dict) -> list[str]:
+    """Extract plain text from all comments on an issue."""
+    return list(iter_comments_text(issue_data))
@@ -0,0 +1,26 @@
+"""
+Record types for analyzed Jira tickets and their status history.
+Status history is stored column-wise so it feeds pandas without per-row conversion.
+"""
+
+from dataclasses import dataclass
+
+# Column name -> values; every list in one mapping has the same length
+Columns = dict[str, list]
+
+
+@dataclass(slots=True)
+class Ticket:
+    """An analyzed ticket as shown on the dashboard."""
+
+    key: str
+    summary: str
+    assignee: str
+    status: str
+    transitions: Columns
+    bounce_backs: Columns
+    bounce_back_count: int
+    time_in_states: Columns
+    hours_logged: float
+    description: str
+    testim_references: list[str]
@@ -0,0 +1,61 @@
+"""
+Equivalence check between the plain-loop and vectorized bounce-back detection.
+Run from the repository root: python -m unittest discover tests
+"""
+
+import random
+import unittest
+from unittest import mock
+
+import utils
+
+_STATUSES = [
+    "To Do", "In Progress", "In Review", "Done", "Blocked",
+    " in review ", "IN PROGRESS", "blocked ", "QA", "",
+]
+
+
+def _random_transitions(count: int, rng: random.Random) -> dict[str, list]:
+    return {
+        "timestamp": [f"2024-01-01T00:00:{index:06d}" for index in range(count)],
+        "from_status": [rng.choice(_STATUSES) for _ in range(count)],
+        "to_status": [rng.choice(_STATUSES) for _ in range(count)],
+        "author": [f"User {index % 7}" for index in range(count)],
+    }
+
+
+class DetectBounceBacksEquivalenceTest(unittest.TestCase):
+    def _detect(self, transitions: dict[str, list], threshold: int) -> dict[str, list]:
+        with mock.patch.object(utils, "_VECTORIZE_MIN_TRANSITIONS", threshold):
+            return utils.detect_bounce_backs(transitions)
+
+    def test_vectorized_matches_loop(self):
+        rng = random.Random(1234)
+        for count in (0, 1, 2, 10, 255, 256, 1000, 5000):
+            transitions = _random_transitions(count, rng)
+            with self.subTest(count=count):
+                loop = self._detect(transitions, threshold=10**9)
+                vectorized = self._detect(transitions, threshold=0)
+                self.assertEqual(vectorized, loop)
+
+    def test_known_transitions(self):
+        transitions = {
+            "timestamp": ["t1", "t2", "t3", "t4"],
+            "from_status": ["To Do", "In Review", "In Progress", "Blocked"],
+            "to_status": ["In Review", "In Progress", "Blocked", "Done"],
+            "author": ["a", "b", "c", "d"],
+        }
+        expected = {
+            "timestamp": ["t2", "t3"],
+            "from_status": ["In Review", "In Progress"],
+            "to_status": ["In Progress", "Blocked"],
+            "author": ["b", "c"],
+            "is_blocked": [False, True],
+        }
+        for threshold in (0, 10**9):
+            with self.subTest(threshold=threshold):
+                self.assertEqual(self._detect(transitions, threshold), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
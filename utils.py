@@ -3,166 +3,278 @@ Utility functions for CSV parsing, bounce-back detection,
 time-in-state calculations, and Testim reference extraction.
 """
 
+import csv
+import os
 import re
 import io
 from datetime import datetime, timezone
+from functools import lru_cache
+from typing import IO, Iterable
 
+import numpy as np
 import pandas as pd
 
+from models import Columns
+
 # Workflow stages in order — lower index = earlier in pipeline
 WORKFLOW_ORDER = ["to do", "in progress", "in review", "done"]
+_WORKFLOW_INDEX = {status: index for index, status in enumerate(WORKFLOW_ORDER)}
 
 # States that represent a blocked/parked ticket (flagged separately from bounce-backs)
-BLOCKED_STATES = {"blocked"}
+BLOCKED_STATES = frozenset({"blocked"})
+
+# Below this many transitions the plain loop beats pandas' setup cost
+_VECTORIZE_MIN_TRANSITIONS = 256
 
 # Regex for Jira issue keys (e.g. PROJ-123)
 _JIRA_KEY_PATTERN = re.compile(r"[A-Z][A-Z0-9]+-\d+")
 _JIRA_KEY_STRICT = re.compile(r"^[A-Z][A-Z0-9]+-\d+$")
 
+try:
+    import re2
+    _find_jira_keys = re2.compile(_JIRA_KEY_PATTERN.pattern).findall
+except ImportError:  # re2 is optional — linear-time on huge pasted text, same matches as re
+    _find_jira_keys = _JIRA_KEY_PATTERN.findall
+
 # Known column names for issue keys in Jira CSV exports
 _CSV_KEY_COLUMNS = ["Key", "Issue key", "Issue Key", "issue_key", "key"]
 
+# Jira exports can hold descriptions and comments far beyond the csv module's 128 KiB
+# default field limit; 2**31 - 1 is the largest value every platform's C long accepts
+csv.field_size_limit(2**31 - 1)
+
+
+def _parse_issue_keys_from_csv_file(csv_file: IO[str]) -> list[str]:
+    """Extract issue keys from an open text-mode CSV file in a single streaming pass."""
+    reader = csv.reader(csv_file)
+    # Skip leading blank lines, as pandas did, so they are not mistaken for an empty header
+    header = next((row for row in reader if row), [])
+    if not header:
+        return []
+
+    key_column = next((name for name in _CSV_KEY_COLUMNS if name in header), None)
+    column_index = header.index(key_column) if key_column else 0
 
-def parse_issue_keys_from_csv(file_content: bytes) -> list[str]:
+    values = (row[column_index].strip() for row in reader if len(row) > column_index)
+    if key_column:
+        return [value for value in values if value]
+
+    # Fallback: first column, filtered to values matching Jira key format (blank never matches)
+    return list(filter(_JIRA_KEY_STRICT.match, values))
+
+
+def parse_issue_keys_from_csv(file_content: bytes | str | os.PathLike | IO[bytes]) -> list[str]:
     """
     Parse a Jira CSV export and extract issue keys.
     Looks for standard key column names, falls back to first column.
+    Accepts raw bytes, a path, or a binary file object; rows are streamed, not loaded whole.
     """
-    dataframe = pd.read_csv(io.BytesIO(file_content))
-
-    for column_name in _CSV_KEY_COLUMNS:
-        if column_name in dataframe.columns:
-            return dataframe[column_name].dropna().astype(str).str.strip().tolist()
+    if isinstance(file_content, (str, os.PathLike)):
+        with open(file_content, encoding="utf-8-sig", newline="") as csv_file:
+            return _parse_issue_keys_from_csv_file(csv_file)
+    if isinstance(file_content, (bytes, bytearray)):
+        file_content = io.BytesIO(file_content)
 
-    # Fallback: first column, filtered to values matching Jira key format
-    first_column = dataframe.iloc[:, 0].dropna().astype(str).str.strip().tolist()
-    return [value for value in first_column if _JIRA_KEY_STRICT.match(value)]
+    csv_file = io.TextIOWrapper(file_content, encoding="utf-8-sig", newline="")
+    try:
+        return _parse_issue_keys_from_csv_file(csv_file)
+    finally:
+        # Detach so the caller's file object is not closed along with the wrapper
+        csv_file.detach()
 
 
 def parse_issue_keys_from_text(text: str) -> list[str]:
     """Extract Jira issue keys from free-form text, preserving order and removing duplicates."""
-    return list(dict.fromkeys(_JIRA_KEY_PATTERN.findall(text)))
+    return list(dict.fromkeys(_find_jira_keys(text)))
 
 
+@lru_cache(maxsize=8192)
 def parse_timestamp(timestamp_str: str) -> datetime:
-    """Parse a Jira ISO timestamp into a timezone-aware datetime."""
+    """
+    Parse a Jira ISO timestamp into a timezone-aware datetime.
+    Results are memoized (datetimes are immutable, so sharing them is safe).
+    Tries the C-level fromisoformat on the raw string first (Python 3.11+ accepts
+    Jira's '+0000' and 'Z' suffixes); older runtimes fall back to normalizing the suffix.
+    """
+    try:
+        return datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        pass
+
     timestamp_str = timestamp_str.replace("Z", "+00:00")
 
     # Jira uses +0000 format (no colon) — convert to +00:00
-    if re.search(r"[+-]\d{4}$", timestamp_str):
+    if len(timestamp_str) >= 5 and timestamp_str[-5] in "+-" and timestamp_str[-4:].isdigit():
         timestamp_str = timestamp_str[:-2] + ":" + timestamp_str[-2:]
 
     return datetime.fromisoformat(timestamp_str)
 
 
-def _workflow_index(status: str) -> int:
-    """Return the position of a status in the workflow, or -1 if unknown/blocked."""
-    normalized = status.strip().lower()
+def _workflow_index_normalized(normalized: str) -> int:
+    """Return the position of an already stripped/lowercased status, or -1 if unknown/blocked."""
     if normalized in BLOCKED_STATES:
         return -1
-    try:
-        return WORKFLOW_ORDER.index(normalized)
-    except ValueError:
-        return -1
+    return _WORKFLOW_INDEX.get(normalized, -1)
+
+
+def _detect_bounce_backs_vectorized(transitions: Columns) -> Columns:
+    """Vectorized detect_bounce_backs for long transition histories; same output."""
+    from_statuses = transitions["from_status"]
+    count = len(from_statuses)
+
+    # Factorize both columns together so each distinct status is normalized only once
+    codes, uniques = pd.factorize(
+        np.array(from_statuses + transitions["to_status"], dtype=object), use_na_sentinel=False
+    )
+    normalized = [status.strip().lower() for status in uniques]
+    index_table = np.array([_workflow_index_normalized(status) for status in normalized])
+    blocked_table = np.array([status in BLOCKED_STATES for status in normalized], dtype=bool)
+
+    from_index = index_table[codes[:count]]
+    to_index = index_table[codes[count:]]
+    is_back = (from_index > 0) & (to_index >= 0) & (to_index < from_index)
+    is_blocked = blocked_table[codes[count:]]
+    rows = np.flatnonzero(is_back | is_blocked)
+
+    bounce_backs = {
+        column: np.array(transitions[column], dtype=object)[rows].tolist()
+        for column in ("timestamp", "from_status", "to_status", "author")
+    }
+    bounce_backs["is_blocked"] = is_blocked[rows].tolist()
+    return bounce_backs
 
 
-def detect_bounce_backs(transitions: list[dict]) -> list[dict]:
+def detect_bounce_backs(transitions: Columns) -> Columns:
     """
     Detect backward movements in the workflow (bounce-backs)
     and transitions to blocked states.
 
     A bounce-back occurs when a ticket moves to an earlier workflow stage
     (e.g. In Review -> In Progress).
+    Takes and returns columnar transitions; the result adds an ``is_blocked`` column.
     """
-    bounce_backs = []
-
-    for transition in transitions:
-        from_index = _workflow_index(transition["from_status"])
-        to_index = _workflow_index(transition["to_status"])
-
-        if from_index > 0 and to_index >= 0 and to_index < from_index:
-            bounce_backs.append(transition)
-
-        if transition["to_status"].strip().lower() in BLOCKED_STATES:
-            blocked_event = dict(transition)
-            blocked_event["is_blocked"] = True
-            bounce_backs.append(blocked_event)
+    if len(transitions["to_status"]) >= _VECTORIZE_MIN_TRANSITIONS:
+        return _detect_bounce_backs_vectorized(transitions)
+
+    bounce_backs = {
+        "timestamp": [],
+        "from_status": [],
+        "to_status": [],
+        "author": [],
+        "is_blocked": [],
+    }
+
+    for index, (from_status, to_status) in enumerate(
+        zip(transitions["from_status"], transitions["to_status"])
+    ):
+        # Normalize each status once; both the index lookup and the blocked check reuse it
+        to_norm = to_status.strip().lower()
+        from_index = _workflow_index_normalized(from_status.strip().lower())
+        to_index = _workflow_index_normalized(to_norm)
+
+        is_back = from_index > 0 and 0 <= to_index < from_index
+        is_blocked = to_norm in BLOCKED_STATES
+
+        # Blocked states have no workflow index, so a transition is at most one of the two
+        if is_back or is_blocked:
+            for column in ("timestamp", "from_status", "to_status", "author"):
+                bounce_backs[column].append(transitions[column][index])
+            bounce_backs["is_blocked"].append(is_blocked)
 
     return bounce_backs
 
 
 def compute_time_in_states(
-    transitions: list[dict],
+    transitions: Columns,
     created_date: str | None = None,
-) -> list[dict]:
+    now: datetime | None = None,
+) -> Columns:
     """
     Compute the duration spent in each state based on transition history.
-    Returns a list of periods with status, entry/exit timestamps, and duration in hours.
+    Returns columnar periods: status (raw and normalized), entry/exit timestamps,
+    and duration in hours. Entry/exit keep Jira's original timestamp strings;
+    only the open-ended current period gets a generated ISO timestamp, ending at ``now``
+    (defaults to the current UTC time; pass one value to pin a whole batch).
     """
-    if not transitions:
-        return []
-
-    periods = []
-    first_transition_time = parse_timestamp(transitions[0]["timestamp"])
-    creation_time = parse_timestamp(created_date) if created_date else first_transition_time
+    periods = {
+        "status": [],
+        "status_norm": [],
+        "entered": [],
+        "exited": [],
+        "duration_hours": [],
+    }
+
+    def append_period(status: str, entered: str, exited: str, hours: float) -> None:
+        periods["status"].append(status)
+        periods["status_norm"].append(status.strip().lower())
+        periods["entered"].append(entered)
+        periods["exited"].append(exited)
+        periods["duration_hours"].append(round(hours, 2))
+
+    timestamps = transitions["timestamp"]
+    if not timestamps:
+        return periods
+
+    first_transition_time = parse_timestamp(timestamps[0])
 
     # Period from creation to first transition (initial state)
-    initial_status = transitions[0]["from_status"]
-    if creation_time < first_transition_time:
-        duration_hours = (first_transition_time - creation_time).total_seconds() / 3600
-        periods.append({
-            "status": initial_status,
-            "entered": creation_time.isoformat(),
-            "exited": first_transition_time.isoformat(),
-            "duration_hours": round(duration_hours, 2),
-        })
-
-    # Each transition marks entry into a new state
-    for index, transition in enumerate(transitions):
-        entered = parse_timestamp(transition["timestamp"])
-
-        if index + 1 < len(transitions):
-            exited = parse_timestamp(transitions[index + 1]["timestamp"])
+    if created_date:
+        creation_time = parse_timestamp(created_date)
+        if creation_time < first_transition_time:
+            append_period(
+                transitions["from_status"][0],
+                created_date,
+                timestamps[0],
+                (first_transition_time - creation_time).total_seconds() / 3600,
+            )
+
+    # Each transition marks entry into a new state; its exit is the next transition's entry
+    entered, entered_time = timestamps[0], first_transition_time
+    for index, to_status in enumerate(transitions["to_status"]):
+        if index + 1 < len(timestamps):
+            exited = timestamps[index + 1]
+            exited_time = parse_timestamp(exited)
         else:
-            exited = datetime.now(timezone.utc)
+            exited_time = now or datetime.now(timezone.utc)
+            exited = exited_time.isoformat()
 
-        duration_hours = (exited - entered).total_seconds() / 3600
-        periods.append({
-            "status": transition["to_status"],
-            "entered": entered.isoformat(),
-            "exited": exited.isoformat(),
-            "duration_hours": round(duration_hours, 2),
-        })
+        append_period(
+            to_status, entered, exited, (exited_time - entered_time).total_seconds() / 3600
+        )
+        entered, entered_time = exited, exited_time
 
     return periods
 
 
 def total_worklog_hours(worklogs: list[dict]) -> float:
     """Calculate total logged time in hours from worklog entries."""
-    total_seconds = sum(entry.get("timeSpentSeconds", 0) for entry in worklogs)
+    # A list comprehension feeds sum() faster than a generator; per-entry work is the same
+    total_seconds = sum([entry.get("timeSpentSeconds", 0) for entry in worklogs])
     return round(total_seconds / 3600, 2)
 
 
-# Patterns for detecting Testim references in text
-_TESTIM_PATTERNS = [
-    re.compile(r"https?://[^\s]*testim[^\s]*", re.IGNORECASE),
-    re.compile(r"testim[:\s]+[\w\-]+", re.IGNORECASE),
-    re.compile(r"test(?:im)?[\s\-_]*(?:id|name|link|url|ref)[\s:]+[\w\-/]+", re.IGNORECASE),
-]
+# Single fused pattern for Testim references: URLs, then test ID/name/link fields,
+# then bare "testim: <name>" mentions. One scan per text instead of one per pattern.
+_TESTIM_PATTERN = re.compile(
+    r"https?://[^\s]*testim[^\s]*"
+    r"|test(?:im)?[\s\-_]*(?:id|name|link|url|ref)[\s:]+(?!https?://)[\w\-/]+"
+    r"|testim[:\s]+[\w\-]+",
+    re.IGNORECASE,
+)
 
 
-def find_testim_references(description_text: str, comments: list[str]) -> list[str]:
+def find_testim_references(texts: Iterable[str]) -> list[str]:
     """
-    Search the issue description and comments for Testim references.
-    Matches Testim URLs, test IDs, and keyword mentions.
+    Search issue texts (description and each comment) for Testim references.
+    Texts are consumed one at a time, so a generator of comments is never collected into a list.
+    Matches Testim URLs, test IDs, and keyword mentions. Each text is scanned on its own,
+    so a match never runs from the end of one text into the next.
     """
     references = []
-
-    for text in [description_text] + comments:
-        if not text:
-            continue
-        for pattern in _TESTIM_PATTERNS:
-            references.extend(pattern.findall(text))
+    for text in texts:
+        # Every alternative contains "test", so most texts can skip the regex scan entirely
+        if text and "test" in text.lower():
+            references.extend(_TESTIM_PATTERN.findall(text))
 
     # Deduplicate preserving order
     return list(dict.fromkeys(references))